@@ -0,0 +1,147 @@
+import hashlib
+import os
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+# Общий слой данных и агрегаций для дашборда (dashboard.py) и JSON API (api.py)
+
+# Строка подключения к БД. Для локальной проверки можно указать SQLite-копию
+# с той же схемой, например: AIR_DB_URL=sqlite:///lesosibirsk_air.db
+DB_URL = os.environ.get('AIR_DB_URL', 'mysql+pymysql://root:@localhost/lesosibirsk_air_monitoring')
+
+# Пороги уровней загрязнения, мг/м³
+HIGH_LEVEL = 0.06
+MEDIUM_LEVEL = 0.03
+
+MEASUREMENTS_QUERY = """
+SELECT
+    m.measurement_id,
+    m.datetime,
+    m.concentration,
+    m.is_exceeded,
+    s.name as station_name,
+    s.latitude,
+    s.longitude,
+    s.type as station_type,
+    p.name as pollutant_name,
+    p.code as pollutant_code,
+    p.pdk_max,
+    p.unit
+FROM measurements m
+JOIN stations s ON m.station_id = s.station_id
+JOIN pollutants p ON m.pollutant_id = p.pollutant_id
+ORDER BY m.datetime DESC
+"""
+
+
+# Загрузка всех измерений с постами и веществами
+def load_measurements(db_url=DB_URL):
+    engine = create_engine(db_url)
+    try:
+        df = pd.read_sql(MEASUREMENTS_QUERY, engine)
+    finally:
+        engine.dispose()
+
+    df['datetime'] = pd.to_datetime(df['datetime'])
+    df['year'] = df['datetime'].dt.year
+    df['month'] = df['datetime'].dt.month
+    df['date'] = df['datetime'].dt.date
+
+    return df
+
+
+MEASUREMENT_COLUMNS = [
+    'measurement_id', 'datetime', 'concentration', 'is_exceeded',
+    'station_name', 'latitude', 'longitude', 'station_type',
+    'pollutant_name', 'pollutant_code', 'pdk_max', 'unit',
+]
+
+
+# Версия данных: меняется при любом изменении загруженных измерений
+def data_version(df):
+    hashes = pd.util.hash_pandas_object(df[MEASUREMENT_COLUMNS], index=False)
+    return hashlib.sha1(hashes.values.tobytes()).hexdigest()[:16]
+
+
+# Уровень загрязнения по средней концентрации
+def pollution_level(concentration):
+    if concentration > HIGH_LEVEL:
+        return 'high'
+    if concentration > MEDIUM_LEVEL:
+        return 'medium'
+    return 'low'
+
+
+# Фильтрация по годам, веществам и постам (None - без фильтра)
+def filter_measurements(df, years=None, pollutants=None, stations=None):
+    mask = pd.Series(True, index=df.index)
+    if years is not None:
+        mask &= df['year'].isin(years)
+    if pollutants is not None:
+        mask &= df['pollutant_name'].isin(pollutants)
+    if stations is not None:
+        mask &= df['station_name'].isin(stations)
+    return df[mask]
+
+
+# Справочник постов наблюдения
+def station_catalog(df):
+    return (
+        df[['station_name', 'latitude', 'longitude', 'station_type']]
+        .drop_duplicates(subset=['station_name'])
+        .sort_values('station_name')
+        .reset_index(drop=True)
+    )
+
+
+# Справочник загрязняющих веществ
+def pollutant_catalog(df):
+    return (
+        df[['pollutant_name', 'pollutant_code', 'pdk_max', 'unit']]
+        .drop_duplicates(subset=['pollutant_name'])
+        .sort_values('pollutant_name')
+        .reset_index(drop=True)
+    )
+
+
+# Средняя концентрация и число превышений по постам (данные для карты)
+def station_summary(df):
+    map_data = df.groupby(['station_name', 'latitude', 'longitude']).agg({
+        'concentration': 'mean',
+        'is_exceeded': 'sum'
+    }).reset_index()
+
+    # Проверяем корректность координат
+    map_data = map_data.dropna(subset=['latitude', 'longitude'])
+    map_data['latitude'] = pd.to_numeric(map_data['latitude'], errors='coerce')
+    map_data['longitude'] = pd.to_numeric(map_data['longitude'], errors='coerce')
+    map_data = map_data.dropna(subset=['latitude', 'longitude'])
+
+    return map_data
+
+
+# Сравнение по годам
+def yearly_comparison(df):
+    yearly = df.groupby(['year', 'pollutant_name']).agg({
+        'concentration': ['mean', 'max', 'count']
+    }).reset_index()
+
+    yearly.columns = ['year', 'pollutant_name', 'avg_concentration', 'max_concentration', 'measurements_count']
+    return yearly
+
+
+# Сравнение по постам и веществам
+def station_comparison(df):
+    comparison = df.groupby(['station_name', 'pollutant_name']).agg({
+        'concentration': ['mean', 'max', 'count'],
+        'is_exceeded': 'sum'
+    }).reset_index()
+
+    comparison.columns = ['station_name', 'pollutant_name', 'avg_concentration', 'max_concentration', 'measurements_count', 'exceedances']
+    return comparison
+
+
+# Среднесуточные концентрации по постам
+def daily_timeseries(df):
+    return df.groupby(['date', 'station_name'])['concentration'].mean().reset_index()
@@ -0,0 +1,424 @@
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+import air_data
+
+# Read-only JSON API с теми же данными и агрегатами, что и дашборд.
+# Запуск: python api.py --port 8502
+# Локальная проверка на SQLite-копии: AIR_DB_URL=sqlite:///lesosibirsk_air.db python api.py
+
+logger = logging.getLogger('air_api')
+
+# Период обновления данных из БД, секунды (как кэш дашборда)
+DATA_TTL = 3600
+
+# Ограничения на размер запросов и ответов; кэш ограничен суммарным размером тел в байтах
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+MAX_FILTER_VALUES = 50
+TIMESERIES_LIMIT = 1000
+TIMESERIES_MAX_LIMIT = 10000
+
+# Ответы меньше этого размера не сжимаются
+GZIP_MIN_SIZE = 512
+
+CACHE_CONTROL = 'public, max-age=60'
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# Готовый ответ: тело, сжатое тело и их ETag считаются один раз при попадании в кэш.
+# У gzip-варианта свой ETag: сильный валидатор должен различаться для разных content-coding
+class CachedResponse:
+    __slots__ = ('body', 'gzip_body', 'etag', 'gzip_etag', 'size')
+
+    def __init__(self, payload, version):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.gzip_body = gzip.compress(self.body, 6) if len(self.body) >= GZIP_MIN_SIZE else None
+        tag = f'{version}-{hashlib.sha1(self.body).hexdigest()[:16]}'
+        self.etag = f'"{tag}"'
+        self.gzip_etag = f'"{tag}-gz"' if self.gzip_body is not None else None
+        self.size = len(self.body) + len(self.gzip_body or b'')
+
+
+# ========== РАЗБОР ПАРАМЕТРОВ ==========
+
+def _date_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value[-1]).isoformat()
+    except ValueError:
+        raise ApiError(400, f"Параметр {name} должен быть датой в формате ГГГГ-ММ-ДД")
+
+
+# Приводим параметры к каноническому виду: он же служит ключом кэша
+def parse_query(path, params):
+    query = {}
+
+    if params.get('year'):
+        try:
+            query['year'] = tuple(sorted({int(y) for y in params['year']}))
+        except ValueError:
+            raise ApiError(400, "Параметр year должен быть целым числом")
+
+    for name in ('pollutant', 'station'):
+        if params.get(name):
+            query[name] = tuple(sorted(set(params[name])))
+
+    for name, values in query.items():
+        if len(values) > MAX_FILTER_VALUES:
+            raise ApiError(400, f"Слишком много значений параметра {name} (максимум {MAX_FILTER_VALUES})")
+
+    if path == '/timeseries':
+        if len(query.get('pollutant', ())) != 1:
+            raise ApiError(400, "Для /timeseries нужно указать ровно одно вещество: pollutant")
+
+        try:
+            limit = int(params.get('limit', [TIMESERIES_LIMIT])[-1])
+        except ValueError:
+            raise ApiError(400, "Параметр limit должен быть целым числом")
+        if not 1 <= limit <= TIMESERIES_MAX_LIMIT:
+            raise ApiError(400, f"Параметр limit должен быть от 1 до {TIMESERIES_MAX_LIMIT}")
+        query['limit'] = limit
+
+        for name in ('date_from', 'date_to'):
+            value = _date_param(params, name)
+            if value is not None:
+                query[name] = value
+
+    return tuple(sorted(query.items()))
+
+
+def _filtered(df, query):
+    return air_data.filter_measurements(
+        df,
+        years=query.get('year'),
+        pollutants=query.get('pollutant'),
+        stations=query.get('station'),
+    )
+
+
+def _records(df):
+    return json.loads(df.to_json(orient='records', date_format='iso', force_ascii=False))
+
+
+# ========== ЭНДПОИНТЫ ==========
+
+def stations_payload(df, query):
+    return {'stations': _records(air_data.station_catalog(_filtered(df, query)))}
+
+
+def pollutants_payload(df, query):
+    return {'pollutants': _records(air_data.pollutant_catalog(_filtered(df, query)))}
+
+
+def aggregates_payload(df, query):
+    data = _filtered(df, query)
+    payload = {
+        'summary': {
+            'measurements': len(data),
+            'stations': int(data['station_name'].nunique()),
+            'pollutants': int(data['pollutant_name'].nunique()),
+            'exceedances': int(data['is_exceeded'].sum()),
+        },
+        'stations': [],
+        'yearly': [],
+        'station_pollutant': [],
+    }
+    if data.empty:
+        return payload
+
+    # Те же таблицы, что на карте и во вкладках сравнения дашборда
+    map_data = air_data.station_summary(data)
+    map_data = map_data.assign(
+        is_exceeded=map_data['is_exceeded'].astype(int),
+        level=map_data['concentration'].apply(air_data.pollution_level),
+    ).rename(columns={'concentration': 'avg_concentration', 'is_exceeded': 'exceedances'})
+
+    payload['stations'] = _records(map_data.sort_values('avg_concentration', ascending=False))
+    payload['yearly'] = _records(
+        air_data.yearly_comparison(data).sort_values(['year', 'avg_concentration'], ascending=[True, False])
+    )
+    payload['station_pollutant'] = _records(air_data.station_comparison(data))
+    return payload
+
+
+def timeseries_payload(df, query):
+    pollutant = query['pollutant'][0]
+
+    # ПДК и единицы берём по веществу целиком, чтобы они не пропадали при пустой выборке
+    pollutant_data = air_data.filter_measurements(df, pollutants=[pollutant])
+    if pollutant_data.empty:
+        raise ApiError(404, f"Неизвестное вещество: {pollutant}")
+
+    pdk_value = pollutant_data['pdk_max'].iloc[0]
+    payload = {
+        'pollutant': pollutant,
+        'pdk_max': float(pdk_value) if pd.notna(pdk_value) else None,
+        'unit': pollutant_data['unit'].iloc[0],
+        'points': [],
+        'truncated': False,
+    }
+
+    data = air_data.filter_measurements(pollutant_data, years=query.get('year'), stations=query.get('station'))
+    if 'date_from' in query:
+        data = data[data['date'] >= date.fromisoformat(query['date_from'])]
+    if 'date_to' in query:
+        data = data[data['date'] <= date.fromisoformat(query['date_to'])]
+    if data.empty:
+        return payload
+
+    # Отдаём самые свежие дни целиком, пока суммарное число точек не превышает limit;
+    # последний день отдаётся всегда, даже если в нём одном точек больше limit
+    time_data = air_data.daily_timeseries(data).sort_values(['date', 'station_name'])
+    if len(time_data) > query['limit']:
+        points_per_day = time_data.groupby('date').size().sort_index(ascending=False)
+        fits = points_per_day.cumsum() <= query['limit']
+        fits.iloc[0] = True
+        kept_days = points_per_day.index[fits]
+        time_data = time_data[time_data['date'].isin(kept_days)]
+        payload['truncated'] = True
+    time_data = time_data.assign(date=time_data['date'].astype(str))
+
+    payload['points'] = _records(time_data)
+    return payload
+
+
+ENDPOINTS = {
+    '/stations': stations_payload,
+    '/pollutants': pollutants_payload,
+    '/aggregates': aggregates_payload,
+    '/timeseries': timeseries_payload,
+}
+
+
+# ========== ДАННЫЕ И КЭШ ==========
+
+# Загруженные данные одной версии вместе с кэшем ответов по ним
+class Snapshot:
+    def __init__(self, df, version, cache_bytes=CACHE_MAX_BYTES):
+        self.df = df
+        self.version = version
+        self.cache_bytes = cache_bytes
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    def response(self, path, query):
+        key = (path, query)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        response = CachedResponse(ENDPOINTS[path](self.df, dict(query)), self.version)
+
+        if response.size > self.cache_bytes:
+            return response
+
+        with self._lock:
+            previous = self._cache.pop(key, None)
+            if previous is not None:
+                self._cached_bytes -= previous.size
+            self._cache[key] = response
+            self._cached_bytes += response.size
+            while self._cached_bytes > self.cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cached_bytes -= evicted.size
+        return response
+
+    # Предрасчёт ответов без фильтров, которые запрашиваются чаще всего
+    def warm(self):
+        for path in ('/stations', '/pollutants', '/aggregates'):
+            self.response(path, parse_query(path, {}))
+        for pollutant in self.df['pollutant_name'].unique():
+            self.response('/timeseries', parse_query('/timeseries', {'pollutant': [pollutant]}))
+
+
+class DataStore:
+    def __init__(self, db_url=air_data.DB_URL, cache_bytes=CACHE_MAX_BYTES):
+        self.db_url = db_url
+        self.cache_bytes = cache_bytes
+        self.snapshot = None
+
+    # Перезагружаем данные; кэш сбрасывается только при смене версии
+    def refresh(self):
+        df = air_data.load_measurements(self.db_url)
+        version = air_data.data_version(df)
+        if self.snapshot is not None and self.snapshot.version == version:
+            return False
+
+        snapshot = Snapshot(df, version, self.cache_bytes)
+        snapshot.warm()
+        self.snapshot = snapshot
+        logger.info("Загружена версия данных %s (%d измерений)", version, len(df))
+        return True
+
+    def response(self, path, params):
+        if path not in ENDPOINTS:
+            raise ApiError(404, f"Неизвестный адрес. Доступны: {', '.join(ENDPOINTS)}")
+        snapshot = self.snapshot
+        return snapshot.response(path, parse_query(path, params))
+
+    def refresh_forever(self, interval, stop_event):
+        while not stop_event.wait(interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Ошибка обновления данных, продолжаем отдавать версию %s", self.snapshot.version)
+
+
+# ========== HTTP ==========
+
+# Явная запись gzip важнее '*': "*, gzip;q=0" означает отказ от gzip
+def _accepts_gzip(header):
+    qualities = {}
+    for item in header.split(','):
+        coding, *params = item.split(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities.get('gzip', qualities.get('*', 0.0)) > 0
+
+
+def _etag_matches(header, etag):
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag == '*' or tag.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'LesosibirskAirAPI/1.0'
+    # Заголовки и тело уходят отдельными send(): без этого keep-alive упирается в задержку Nagle
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def _handle(self, send_body):
+        # http.server декодирует строку запроса как latin-1; кириллицу без %-кодирования возвращаем в UTF-8
+        url = urlsplit(self.path.encode('latin-1').decode('utf-8', 'replace'))
+        path = url.path.rstrip('/') or '/'
+        try:
+            response = self.server.store.response(path, parse_qs(url.query))
+        except ApiError as e:
+            self._send_error(e.status, e.message, send_body)
+            return
+        except Exception:
+            logger.exception("Ошибка обработки запроса %s", self.path)
+            self._send_error(500, "Внутренняя ошибка сервера", send_body)
+            return
+
+        use_gzip = response.gzip_body is not None and _accepts_gzip(self.headers.get('Accept-Encoding', ''))
+        if use_gzip:
+            body, etag = response.gzip_body, response.gzip_etag
+        else:
+            body, etag = response.body, response.etag
+
+        if _etag_matches(self.headers.get('If-None-Match', ''), etag):
+            self.send_response(304)
+            self._send_cache_headers(etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self._send_cache_headers(etag)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _send_cache_headers(self, etag):
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', CACHE_CONTROL)
+        self.send_header('Vary', 'Accept-Encoding')
+
+    def _send_error(self, status, message, send_body):
+        body = json.dumps({'error': message}, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    # Пишем в лог только ошибки, чтобы не тормозить на каждом запросе
+    def log_request(self, code='-', size='-'):
+        if isinstance(code, int) and code >= 400:
+            super().log_request(code, size)
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, store):
+        super().__init__(address, ApiHandler)
+        self.store = store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON API мониторинга качества воздуха г. Лесосибирска")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--db-url', default=air_data.DB_URL)
+    parser.add_argument('--ttl', type=int, default=DATA_TTL, help="период обновления данных, секунды")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    store = DataStore(args.db_url)
+    store.refresh()
+
+    stop_event = threading.Event()
+    threading.Thread(target=store.refresh_forever, args=(args.ttl, stop_event), daemon=True).start()
+
+    server = ApiServer((args.host, args.port), store)
+    logger.info("API запущен на http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,10 +2,11 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from sqlalchemy import create_engine
 from datetime import datetime
 import json
 
+import air_data
+
 # Настройки страницы
 st.set_page_config(
     page_title="Качество воздуха в Лесосибирске",
@@ -24,37 +25,7 @@ YANDEX_API_KEY = "c6d29f5d-142f-480b-a697-ce23ad183265"
 @st.cache_data(ttl=3600)
 def load_data():
     try:
-        engine = create_engine('mysql+pymysql://root:@localhost/lesosibirsk_air_monitoring')
-        
-        query = """
-        SELECT 
-            m.measurement_id,
-            m.datetime,
-            m.concentration,
-            m.is_exceeded,
-            s.name as station_name,
-            s.latitude,
-            s.longitude,
-            s.type as station_type,
-            p.name as pollutant_name,
-            p.code as pollutant_code,
-            p.pdk_max,
-            p.unit
-        FROM measurements m
-        JOIN stations s ON m.station_id = s.station_id
-        JOIN pollutants p ON m.pollutant_id = p.pollutant_id
-        ORDER BY m.datetime DESC
-        """
-        
-        df = pd.read_sql(query, engine)
-        
-        if not df.empty:
-            df['datetime'] = pd.to_datetime(df['datetime'])
-            df['year'] = df['datetime'].dt.year
-            df['month'] = df['datetime'].dt.month
-            df['date'] = df['datetime'].dt.date
-            
-        return df
+        return air_data.load_measurements()
         
     except Exception as e:
         st.error(f"Ошибка загрузки данных: {e}")
@@ -96,11 +67,7 @@ selected_stations = st.sidebar.multiselect(
 )
 
 # Применяем фильтры
-filtered_df = df[
-    (df['year'].isin(selected_years)) &
-    (df['pollutant_name'].isin(selected_pollutants)) &
-    (df['station_name'].isin(selected_stations))
-]
+filtered_df = air_data.filter_measurements(df, selected_years, selected_pollutants, selected_stations)
 
 # ========== РАЗДЕЛ 1: СТАТИСТИКА ==========
 st.header("📊 Общая статистика")
@@ -120,16 +87,7 @@ st.header("🗺️ Карта загрязнения с зонами влиян
 
 if not filtered_df.empty:
     # Подготавливаем данные для карты
-    map_data = filtered_df.groupby(['station_name', 'latitude', 'longitude']).agg({
-        'concentration': 'mean',
-        'is_exceeded': 'sum'
-    }).reset_index()
-    
-    # Проверяем корректность координат
-    map_data = map_data.dropna(subset=['latitude', 'longitude'])
-    map_data['latitude'] = pd.to_numeric(map_data['latitude'], errors='coerce')
-    map_data['longitude'] = pd.to_numeric(map_data['longitude'], errors='coerce')
-    map_data = map_data.dropna(subset=['latitude', 'longitude'])
+    map_data = air_data.station_summary(filtered_df)
     
     if len(map_data) > 0:
         # Рассчитываем параметры
@@ -149,10 +107,10 @@ if not filtered_df.empty:
             exceedances = int(row['is_exceeded'])
             
             # Определяем цвет зоны
-            if concentration > 0.06:
+            if concentration > air_data.HIGH_LEVEL:
                 zone_color = 'rgba(231, 76, 60, 0.15)'  # Красный, 15% прозрачность
                 border_color = 'rgba(231, 76, 60, 0.7)'
-            elif concentration > 0.03:
+            elif concentration > air_data.MEDIUM_LEVEL:
                 zone_color = 'rgba(241, 196, 15, 0.15)'  # Желтый
                 border_color = 'rgba(241, 196, 15, 0.7)'
             else:
@@ -210,12 +168,12 @@ if not filtered_df.empty:
             exceedances = int(row['is_exceeded'])
             
             # Определяем цвет и символ метки
-            if concentration > 0.06:
+            if concentration > air_data.HIGH_LEVEL:
                 marker_color = '#e74c3c'  # Красный
                 marker_symbol = 'circle'
                 marker_size = 14
                 level = '🔴 Высокий'
-            elif concentration > 0.03:
+            elif concentration > air_data.MEDIUM_LEVEL:
                 marker_color = '#f1c40f'  # Желтый
                 marker_symbol = 'square'
                 marker_size = 12
@@ -316,7 +274,7 @@ if not filtered_df.empty:
                 color='#2ecc71',
                 symbol='triangle-up'
             ),
-            name='🟢 Низкое (< 0.03 мг/м³)',
+            name=f'🟢 Низкое (< {air_data.MEDIUM_LEVEL} мг/м³)',
             showlegend=True
         ))
         
@@ -329,7 +287,7 @@ if not filtered_df.empty:
                 color='#f1c40f',
                 symbol='square'
             ),
-            name='🟡 Среднее (0.03-0.06)',
+            name=f'🟡 Среднее ({air_data.MEDIUM_LEVEL}-{air_data.HIGH_LEVEL})',
             showlegend=True
         ))
         
@@ -342,7 +300,7 @@ if not filtered_df.empty:
                 color='#e74c3c',
                 symbol='circle'
             ),
-            name='🔴 Высокое (> 0.06)',
+            name=f'🔴 Высокое (> {air_data.HIGH_LEVEL})',
             showlegend=True
         ))
         
@@ -392,11 +350,11 @@ if not filtered_df.empty:
                 """)
             
             with col3:
-                st.markdown("""
+                st.markdown(f"""
                 **📊 Уровни загрязнения:**
-                - **Низкий:** < 0.03 мг/м³ (безопасно)
-                - **Средний:** 0.03-0.06 мг/м³ (внимание)
-                - **Высокий:** > 0.06 мг/м³ (опасно)
+                - **Низкий:** < {air_data.MEDIUM_LEVEL} мг/м³ (безопасно)
+                - **Средний:** {air_data.MEDIUM_LEVEL}-{air_data.HIGH_LEVEL} мг/м³ (внимание)
+                - **Высокий:** > {air_data.HIGH_LEVEL} мг/м³ (опасно)
                 """)
         
         # ========== ТАБЛИЦА С ДАННЫМИ ==========
@@ -408,8 +366,8 @@ if not filtered_df.empty:
         display_data['Концентрация'] = display_data['concentration'].apply(lambda x: f"{x:.3f} мг/м³")
         display_data['Превышения'] = display_data['is_exceeded'].astype(int)
         display_data['Уровень'] = display_data['concentration'].apply(
-            lambda x: ('🔴 Высокий', '#ffebee') if x > 0.06 else 
-                     ('🟡 Средний', '#fff3e0') if x > 0.03 else 
+            lambda x: ('🔴 Высокий', '#ffebee') if x > air_data.HIGH_LEVEL else 
+                     ('🟡 Средний', '#fff3e0') if x > air_data.MEDIUM_LEVEL else 
                      ('🟢 Низкий', '#e8f5e9')
         )
         
@@ -447,7 +405,7 @@ if not filtered_df.empty:
             st.metric("Макс. радиус зоны", f"{int(min(max_radius, 2000))} м")
         
         with stat_cols[2]:
-            high_pollution = len(map_data[map_data['concentration'] > 0.06])
+            high_pollution = len(map_data[map_data['concentration'] > air_data.HIGH_LEVEL])
             st.metric("Постов с высоким загрязнением", high_pollution)
         
         with stat_cols[3]:
@@ -487,7 +445,7 @@ if not filtered_df.empty and selected_pollutants:
             
             if not pollutant_data.empty:
                 # Группируем по дате и посту
-                time_data = pollutant_data.groupby(['date', 'station_name'])['concentration'].mean().reset_index()
+                time_data = air_data.daily_timeseries(pollutant_data)
                 
                 # Строим график
                 fig = px.line(
@@ -540,11 +498,7 @@ if not filtered_df.empty and selected_pollutants:
         st.subheader("Сравнение по годам")
         
         # Подготавливаем данные для сравнения
-        yearly_comparison = filtered_df.groupby(['year', 'pollutant_name']).agg({
-            'concentration': ['mean', 'max', 'count']
-        }).reset_index()
-        
-        yearly_comparison.columns = ['year', 'pollutant_name', 'avg_concentration', 'max_concentration', 'measurements_count']
+        yearly_comparison = air_data.yearly_comparison(filtered_df)
         
         if not yearly_comparison.empty:
             # График средних концентраций по годам
@@ -570,12 +524,7 @@ if not filtered_df.empty and selected_pollutants:
         st.subheader("Сравнение по постам наблюдения")
         
         # Подготавливаем данные для сравнения по постам
-        station_comparison = filtered_df.groupby(['station_name', 'pollutant_name']).agg({
-            'concentration': ['mean', 'max', 'count'],
-            'is_exceeded': 'sum'
-        }).reset_index()
-        
-        station_comparison.columns = ['station_name', 'pollutant_name', 'avg_concentration', 'max_concentration', 'measurements_count', 'exceedances']
+        station_comparison = air_data.station_comparison(filtered_df)
         
         if not station_comparison.empty:
             # Heatmap сравнения
@@ -599,7 +548,7 @@ if not filtered_df.empty and selected_pollutants:
             st.write("**Рейтинг постов по уровню загрязнения:**")
             station_ranking = filtered_df.groupby('station_name')['concentration'].mean().sort_values(ascending=False)
             for idx, (station, conc) in enumerate(station_ranking.items(), 1):
-                level = "🔴 Высокий" if conc > 0.06 else "🟡 Средний" if conc > 0.03 else "🟢 Низкий"
+                level = "🔴 Высокий" if conc > air_data.HIGH_LEVEL else "🟡 Средний" if conc > air_data.MEDIUM_LEVEL else "🟢 Низкий"
                 st.write(f"{idx}. **{station}**: {conc:.3f} мг/м³ ({level})")
 
 else:
@@ -0,0 +1,377 @@
+import gzip
+import http.client
+import json
+import sqlite3
+import threading
+
+import pytest
+
+import air_data
+import api
+
+STATIONS = [
+    (1, 'Пост 1', 58.24, 92.49, 'авто'),
+    (2, 'Пост 2', 58.25, 92.50, 'авто'),
+    (3, 'Пост 3', 58.26, 92.51, 'ручной'),
+]
+
+POLLUTANTS = [
+    (1, 'Диоксид азота (NO2)', 'NO2', 0.2, 'мг/м³'),
+    (2, 'Формальдегид', 'HCHO', None, 'мг/м³'),
+]
+
+DAYS = ['2023-12-30', '2023-12-31', '2024-01-01', '2024-01-02']
+
+
+# SQLite-копия схемы БД с небольшим набором измерений
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / 'air.db'
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE stations (station_id INTEGER PRIMARY KEY, name TEXT, latitude REAL, longitude REAL, type TEXT);
+        CREATE TABLE pollutants (pollutant_id INTEGER PRIMARY KEY, name TEXT, code TEXT, pdk_max REAL, unit TEXT);
+        CREATE TABLE measurements (
+            measurement_id INTEGER PRIMARY KEY, station_id INTEGER, pollutant_id INTEGER,
+            datetime TEXT, concentration REAL, is_exceeded INTEGER
+        );
+    """)
+    conn.executemany("INSERT INTO stations VALUES (?, ?, ?, ?, ?)", STATIONS)
+    conn.executemany("INSERT INTO pollutants VALUES (?, ?, ?, ?, ?)", POLLUTANTS)
+
+    rows = []
+    for day_idx, day in enumerate(DAYS):
+        for station_id, *_ in STATIONS:
+            for pollutant_id, *_ in POLLUTANTS:
+                for hour in ('06:00:00', '18:00:00'):
+                    concentration = 0.01 * (day_idx + 1) * station_id + 0.005 * pollutant_id
+                    rows.append((station_id, pollutant_id, f'{day} {hour}', concentration, int(concentration > 0.06)))
+    conn.executemany(
+        "INSERT INTO measurements (station_id, pollutant_id, datetime, concentration, is_exceeded) VALUES (?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def db_url(db_path):
+    return f'sqlite:///{db_path}'
+
+
+@pytest.fixture
+def df(db_url):
+    return air_data.load_measurements(db_url)
+
+
+@pytest.fixture
+def store(db_url):
+    store = api.DataStore(db_url=db_url)
+    store.refresh()
+    return store
+
+
+@pytest.fixture
+def server(store):
+    server = api.ApiServer(('127.0.0.1', 0), store)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, path, method='GET', headers=None):
+    conn = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=5)
+    try:
+        conn.request(method, path, headers=headers or {})
+        response = conn.getresponse()
+        return response, response.read()
+    finally:
+        conn.close()
+
+
+# ========== РАЗБОР ПАРАМЕТРОВ ==========
+
+def test_parse_query_is_canonical():
+    first = api.parse_query('/aggregates', {'year': ['2024', '2023', '2024'], 'station': ['Б', 'А', 'Б']})
+    second = api.parse_query('/aggregates', {'station': ['А', 'Б'], 'year': ['2023', '2024']})
+
+    assert first == second == (('station', ('А', 'Б')), ('year', (2023, 2024)))
+
+
+def test_parse_query_ignores_unknown_params():
+    assert api.parse_query('/stations', {'utm_source': ['bot']}) == ()
+
+
+def test_parse_query_timeseries_defaults():
+    query = dict(api.parse_query('/timeseries', {'pollutant': ['Формальдегид']}))
+
+    assert query == {'pollutant': ('Формальдегид',), 'limit': api.TIMESERIES_LIMIT}
+
+
+@pytest.mark.parametrize('path, params', [
+    ('/aggregates', {'year': ['2023', 'x']}),
+    ('/aggregates', {'station': [str(i) for i in range(api.MAX_FILTER_VALUES + 1)]}),
+    ('/timeseries', {}),
+    ('/timeseries', {'pollutant': ['NO2', 'HCHO']}),
+    ('/timeseries', {'pollutant': ['NO2'], 'limit': ['abc']}),
+    ('/timeseries', {'pollutant': ['NO2'], 'limit': ['0']}),
+    ('/timeseries', {'pollutant': ['NO2'], 'limit': [str(api.TIMESERIES_MAX_LIMIT + 1)]}),
+    ('/timeseries', {'pollutant': ['NO2'], 'date_from': ['2024-13-01']}),
+    ('/timeseries', {'pollutant': ['NO2'], 'date_to': ['вчера']}),
+])
+def test_parse_query_rejects_bad_params(path, params):
+    with pytest.raises(api.ApiError) as excinfo:
+        api.parse_query(path, params)
+    assert excinfo.value.status == 400
+
+
+# ========== ЭНДПОИНТЫ ==========
+
+def test_stations_and_pollutants_payloads(df):
+    stations = api.stations_payload(df, {})['stations']
+    pollutants = api.pollutants_payload(df, {})['pollutants']
+
+    assert [s['station_name'] for s in stations] == ['Пост 1', 'Пост 2', 'Пост 3']
+    assert pollutants[0] == {'pollutant_name': 'Диоксид азота (NO2)', 'pollutant_code': 'NO2', 'pdk_max': 0.2, 'unit': 'мг/м³'}
+    assert pollutants[1]['pdk_max'] is None
+
+
+def test_aggregates_payload_matches_dashboard(df):
+    query = {'year': (2024,)}
+    payload = api.aggregates_payload(df, query)
+    data = air_data.filter_measurements(df, years=[2024])
+
+    assert payload['summary'] == {
+        'measurements': len(data),
+        'stations': 3,
+        'pollutants': 2,
+        'exceedances': int(data['is_exceeded'].sum()),
+    }
+
+    map_data = air_data.station_summary(data).set_index('station_name')
+    assert len(payload['stations']) == len(map_data)
+    for row in payload['stations']:
+        expected = map_data.loc[row['station_name']]
+        assert row['avg_concentration'] == pytest.approx(expected['concentration'])
+        assert row['exceedances'] == expected['is_exceeded']
+        assert row['level'] == air_data.pollution_level(expected['concentration'])
+
+    yearly = air_data.yearly_comparison(data).set_index('pollutant_name')
+    for row in payload['yearly']:
+        expected = yearly.loc[row['pollutant_name']]
+        assert row['year'] == 2024
+        assert row['avg_concentration'] == pytest.approx(expected['avg_concentration'])
+        assert row['max_concentration'] == pytest.approx(expected['max_concentration'])
+        assert row['measurements_count'] == expected['measurements_count']
+
+    comparison = air_data.station_comparison(data).set_index(['station_name', 'pollutant_name'])
+    assert len(payload['station_pollutant']) == len(comparison)
+    for row in payload['station_pollutant']:
+        expected = comparison.loc[(row['station_name'], row['pollutant_name'])]
+        assert row['avg_concentration'] == pytest.approx(expected['avg_concentration'])
+        assert row['exceedances'] == expected['exceedances']
+
+
+def test_aggregates_payload_empty_selection(df):
+    payload = api.aggregates_payload(df, {'station': ('Нет такого',)})
+
+    assert payload['summary']['measurements'] == 0
+    assert payload['stations'] == payload['yearly'] == payload['station_pollutant'] == []
+
+
+def test_timeseries_payload_matches_dashboard(df):
+    query = dict(api.parse_query('/timeseries', {'pollutant': ['Диоксид азота (NO2)']}))
+    payload = api.timeseries_payload(df, query)
+    data = air_data.filter_measurements(df, pollutants=['Диоксид азота (NO2)'])
+    expected = air_data.daily_timeseries(data)
+
+    assert payload['pdk_max'] == 0.2
+    assert payload['unit'] == 'мг/м³'
+    assert payload['truncated'] is False
+    assert len(payload['points']) == len(expected)
+    for point in payload['points']:
+        row = expected[(expected['date'].astype(str) == point['date']) & (expected['station_name'] == point['station_name'])]
+        assert point['concentration'] == pytest.approx(row['concentration'].iloc[0])
+
+
+def test_timeseries_payload_date_range(df):
+    query = dict(api.parse_query('/timeseries', {
+        'pollutant': ['Формальдегид'], 'date_from': ['2023-12-31'], 'date_to': ['2024-01-01'],
+    }))
+    points = api.timeseries_payload(df, query)['points']
+
+    assert sorted({p['date'] for p in points}) == ['2023-12-31', '2024-01-01']
+
+
+def test_timeseries_empty_range_keeps_pollutant_info(df):
+    query = dict(api.parse_query('/timeseries', {'pollutant': ['Диоксид азота (NO2)'], 'date_from': ['2024-02-01']}))
+    payload = api.timeseries_payload(df, query)
+
+    assert payload['points'] == []
+    assert payload['pdk_max'] == 0.2
+    assert payload['unit'] == 'мг/м³'
+
+
+def test_timeseries_unknown_pollutant(df):
+    query = dict(api.parse_query('/timeseries', {'pollutant': ['Нет такого']}))
+
+    with pytest.raises(api.ApiError) as excinfo:
+        api.timeseries_payload(df, query)
+    assert excinfo.value.status == 404
+
+
+def test_timeseries_truncates_whole_days(df):
+    query = dict(api.parse_query('/timeseries', {'pollutant': ['Формальдегид'], 'limit': ['7']}))
+    payload = api.timeseries_payload(df, query)
+
+    assert payload['truncated'] is True
+    assert len(payload['points']) == 6
+    assert sorted({p['date'] for p in payload['points']}) == ['2024-01-01', '2024-01-02']
+
+
+def test_timeseries_keeps_newest_day_over_limit(df):
+    query = dict(api.parse_query('/timeseries', {'pollutant': ['Формальдегид'], 'limit': ['2']}))
+    payload = api.timeseries_payload(df, query)
+
+    assert payload['truncated'] is True
+    assert [p['date'] for p in payload['points']] == ['2024-01-02'] * len(STATIONS)
+
+
+# ========== КЭШ И ВЕРСИИ ДАННЫХ ==========
+
+def test_snapshot_evicts_least_recently_used(df):
+    queries = [api.parse_query('/aggregates', {'year': [year]}) for year in ('2023', '2024')]
+    sizes = [api.CachedResponse(api.aggregates_payload(df, dict(q)), 'v').size for q in queries]
+    snapshot = api.Snapshot(df, 'v', cache_bytes=sum(sizes))
+
+    first = snapshot.response('/aggregates', queries[0])
+    snapshot.response('/aggregates', queries[1])
+    assert snapshot.response('/aggregates', queries[0]) is first
+
+    snapshot.response('/stations', ())
+    keys = list(snapshot._cache)
+    assert ('/aggregates', queries[1]) not in keys
+    assert keys[-2:] == [('/aggregates', queries[0]), ('/stations', ())]
+    assert snapshot._cached_bytes <= snapshot.cache_bytes
+
+
+def test_snapshot_skips_responses_over_budget(df):
+    snapshot = api.Snapshot(df, 'v', cache_bytes=10)
+
+    snapshot.response('/aggregates', ())
+    assert not snapshot._cache
+    assert snapshot._cached_bytes == 0
+
+
+def test_refresh_keeps_snapshot_for_same_version(db_path, store):
+    snapshot = store.snapshot
+    cached = snapshot.response('/stations', ())
+
+    assert store.refresh() is False
+    assert store.snapshot is snapshot
+    assert store.response('/stations', {}) is cached
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO measurements (station_id, pollutant_id, datetime, concentration, is_exceeded) "
+                 "VALUES (1, 1, '2024-01-03 06:00:00', 0.5, 1)")
+    conn.commit()
+    conn.close()
+
+    assert store.refresh() is True
+    assert store.snapshot is not snapshot
+    assert store.snapshot.version != snapshot.version
+    summary = json.loads(store.response('/aggregates', {}).body)['summary']
+    assert summary['measurements'] == len(snapshot.df) + 1
+
+
+# ========== HTTP ==========
+
+def test_http_returns_json(server):
+    response, body = request(server, '/aggregates?year=2024')
+
+    assert response.status == 200
+    assert response.getheader('Content-Type') == 'application/json; charset=utf-8'
+    assert json.loads(body)['summary']['stations'] == 3
+
+
+def test_http_not_modified_on_matching_etag(server):
+    response, _ = request(server, '/aggregates')
+    etag = response.getheader('ETag')
+
+    response, body = request(server, '/aggregates', headers={'If-None-Match': etag})
+    assert response.status == 304
+    assert response.getheader('ETag') == etag
+    assert body == b''
+
+    response, _ = request(server, '/aggregates', headers={'If-None-Match': '"other-version"'})
+    assert response.status == 200
+
+
+def test_http_gzip_only_when_accepted(server):
+    plain, plain_body = request(server, '/aggregates')
+    assert plain.getheader('Content-Encoding') is None
+
+    for header in ('gzip;q=0', '*, gzip;q=0', 'gzip;q=0, *', 'gzip; q=0.000, deflate', 'deflate'):
+        refused, _ = request(server, '/aggregates', headers={'Accept-Encoding': header})
+        assert refused.getheader('Content-Encoding') is None, header
+
+    for header in ('*', 'deflate, gzip;q=0.5', 'deflate;q=0, *', 'GZIP'):
+        accepted, _ = request(server, '/aggregates', headers={'Accept-Encoding': header})
+        assert accepted.getheader('Content-Encoding') == 'gzip', header
+
+    zipped, zipped_body = request(server, '/aggregates', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert zipped.getheader('Content-Encoding') == 'gzip'
+    assert gzip.decompress(zipped_body) == plain_body
+    assert zipped.getheader('ETag') != plain.getheader('ETag')
+
+    # ETag несжатого варианта не подходит для gzip-ответа
+    response, _ = request(server, '/aggregates', headers={
+        'Accept-Encoding': 'gzip', 'If-None-Match': plain.getheader('ETag'),
+    })
+    assert response.status == 200
+    assert response.getheader('Content-Encoding') == 'gzip'
+
+
+def test_http_unknown_path(server):
+    response, body = request(server, '/nope')
+
+    assert response.status == 404
+    assert 'error' in json.loads(body)
+
+
+def test_http_bad_params(server):
+    response, body = request(server, '/timeseries')
+
+    assert response.status == 400
+    assert 'pollutant' in json.loads(body)['error']
+
+
+def test_http_unknown_pollutant(server):
+    response, body = request(server, '/timeseries?pollutant=%D0%9D%D0%B5%D1%82')
+
+    assert response.status == 404
+    assert 'вещество' in json.loads(body)['error']
+
+
+def test_http_head_has_no_body(server):
+    get, get_body = request(server, '/stations')
+    head, head_body = request(server, '/stations', method='HEAD')
+
+    assert head.status == 200
+    assert head_body == b''
+    assert head.getheader('Content-Length') == str(len(get_body))
+    assert head.getheader('ETag') == get.getheader('ETag')
+
+
+def test_http_unexpected_error(server, monkeypatch):
+    def broken(df, query):
+        raise TypeError("unsupported operand")
+
+    monkeypatch.setitem(api.ENDPOINTS, '/pollutants', broken)
+    response, body = request(server, '/pollutants?year=2023')
+
+    assert response.status == 500
+    assert 'error' in json.loads(body)